@@ -3,83 +3,308 @@ import os
 import json
 import subprocess
 import datetime
+import functools
 import glob
+import re
 import shutil
+import math
+import threading
 import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+import orjson
 import default_values
-
-def get_video_fps(video_path):
+from video_utils import get_video_info, load_probe_cache, probe_cache_key, save_probe_cache
+
+# Matches the frame rate in ffmpeg's stream banner, e.g.
+# "Stream #0:0: Video: h264 (High), yuv420p, 1920x1080, 25 fps, 25 tbr, ..."
+FFMPEG_FPS_PATTERN = re.compile(r"Stream #\S+.*?: Video: .*?(\d+(?:\.\d+)?)(k?) fps")
+# Matches the input duration in ffmpeg's banner, e.g. "  Duration: 00:00:12.04, start: 0.000000, ..."
+FFMPEG_DURATION_PATTERN = re.compile(r"Duration: (\d+):(\d+):(\d+(?:\.\d+)?)")
+
+# Serialized "images" entry of Labels-GameState.json, only the frame number varies.
+# Formatted with `% (i, i)`, which is much cheaper than building and dumping a dict per frame.
+IMAGE_ENTRY_TEMPLATE = orjson.dumps({
+    "is_labeled": False,
+    "image_id": "%06d",
+    "file_name": "%06d.jpg",
+    "height": 1080,
+    "width": 1920
+})
+FIRST_IMAGE_ENTRY_TEMPLATE = b'\n' + IMAGE_ENTRY_TEMPLATE
+NEXT_IMAGE_ENTRY_TEMPLATE = b',\n' + IMAGE_ENTRY_TEMPLATE
+# Image entries written per os.writev call, bounded by the OS limit on buffers per call
+IMAGES_PER_CHUNK = min(os.sysconf('SC_IOV_MAX'), 4096) if 'SC_IOV_MAX' in os.sysconf_names else 1024
+
+# ffmpeg hardware decoders and their matching GPU scale filter, in order of preference
+HWACCEL_SCALE_FILTERS = [
+    ('cuda', 'scale_cuda=1920:1080'),
+    ('vaapi', 'scale_vaapi=w=1920:h=1080:format=nv12'),
+]
+
+# Set once a hardware accelerated extraction failed, later videos in this process go straight to the CPU
+hwaccel_failed = False
+
+def hwaccel_device_works(hwaccel):
     """
-    Returns the frames per second (float) of the first video stream by parsing
-    ffprobe's 'r_frame_rate' output (e.g., '25/1', '30/1', or '30000/1001').
+    Returns True if ffmpeg can actually open a `hwaccel` device on this machine.
+    `ffmpeg -hwaccels` only lists what the build supports, e.g. distro builds list
+    cuda and vaapi even without a GPU.
     """
     cmd = [
-        'ffprobe',
-        '-v', 'error',
-        '-select_streams', 'v:0',
-        '-show_entries', 'stream=r_frame_rate',
-        '-of', 'default=noprint_wrappers=1:nokey=1',
-        video_path
+        'ffmpeg', '-hide_banner', '-loglevel', 'error',
+        '-init_hw_device', hwaccel,
+        '-f', 'lavfi', '-i', 'nullsrc=s=16x16:d=0.04',
+        '-frames:v', '1', '-f', 'null', '-'
     ]
-    proc = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, check=True, timeout=10)
-    raw_rate = proc.stdout.strip()
-
-    if '/' in raw_rate:
-        numerator, denominator = raw_rate.split('/')
-        return float(numerator) / float(denominator)
-    else:
-        return float(raw_rate)
+    try:
+        subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=True, timeout=10)
+    except (OSError, subprocess.SubprocessError):
+        return False
+    return True
 
-def extract_frames(video_path, output_folder, frame_interval=1):
+@functools.lru_cache(maxsize=None)
+def get_hwaccel():
     """
-    Extracts frames from the video file (video_path) at 1920x1080 resolution
-    and saves them as sequential .jpg images in output_folder.
-
-    If frame_interval > 1, only every nth frame is extracted using the framestep filter.
-    For example, if frame_interval == 10, frames 1, 11, 21, ... will be extracted.
+    Returns the (hwaccel, scale filter) pair from HWACCEL_SCALE_FILTERS of the first
+    hardware acceleration method this ffmpeg build supports and has a working device
+    for, or None if there is none. Only queried once per process.
     """
-    os.makedirs(output_folder, exist_ok=True)
-    
-    if frame_interval > 1:
-        # Use the framestep filter to output one frame every {frame_interval} frames.
-        filter_chain = f"framestep={frame_interval},scale=1920:1080"
+    cmd = ['ffmpeg', '-hide_banner', '-hwaccels']
+    try:
+        proc = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True, check=True, timeout=10)
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+    # Output is a "Hardware acceleration methods:" header followed by one method per line
+    available = set(proc.stdout.split()[3:])
+    for hwaccel, scale_filter in HWACCEL_SCALE_FILTERS:
+        if hwaccel in available and hwaccel_device_works(hwaccel):
+            return hwaccel, scale_filter
+    return None
+
+def build_extract_cmd(video_path, output_folder, frame_interval=1, threads=0, hwaccel=None, scale=True):
+    """
+    Builds the ffmpeg command used by extract_frames. If hwaccel is a
+    (hwaccel, scale filter) pair, frames are decoded and scaled on the GPU
+    and only downloaded to system memory for the JPEG encoding.
+    With scale=False (input is already 1920x1080) no scale filter is added.
+    """
+    filters = []
+    if hwaccel:
+        name, scale_filter = hwaccel
+        input_args = ['-hwaccel', name, '-hwaccel_output_format', name]
+        if scale:
+            filters.append(scale_filter)
+        filters += ["hwdownload", "format=nv12"]
+        if frame_interval > 1:
+            filters.append(f"framestep={frame_interval}")
     else:
-        filter_chain = "scale=1920:1080"
-    
-    cmd = [
+        input_args = []
+        if frame_interval > 1:
+            # Use the framestep filter to output one frame every {frame_interval} frames.
+            filters.append(f"framestep={frame_interval}")
+        if scale:
+            filters.append("scale=1920:1080")
+    filter_args = ['-vf', ",".join(filters)] if filters else []
+
+    return [
         'ffmpeg',
+        '-nostats',  # No progress lines on stderr, only the banner and warnings
+        '-threads', str(threads),
+        *input_args,
         '-i', video_path,
-        '-vf', filter_chain,
+        *filter_args,
+        '-threads', str(threads),
         '-qscale:v', '2',
         '-start_number', '1',
         '-vsync', '0',
         os.path.join(output_folder, '%06d.jpg')
     ]
-    
+
+def extract_frames(video_path, output_folder, frame_interval=1, threads=0, on_stream_info=None, scale=True):
+    """
+    Extracts frames from the video file (video_path) at 1920x1080 resolution
+    and saves them as sequential .jpg images in output_folder. Pass scale=False
+    if the video already is 1920x1080 to skip the scale filter.
+
+    If frame_interval > 1, only every nth frame is extracted using the framestep filter.
+    For example, if frame_interval == 10, frames 1, 11, 21, ... will be extracted.
+
+    threads limits the threads ffmpeg uses (0 = ffmpeg default), so that several
+    videos can be extracted in parallel without oversubscribing the CPU.
+
+    Decoding and scaling run on the GPU when ffmpeg supports a method from
+    HWACCEL_SCALE_FILTERS and its device works, falling back to the CPU if that
+    fails. Only if the CPU then succeeds is the failure blamed on the GPU, and the
+    CPU used for every later video in the process.
+
+    Returns the frame rate of the input, parsed from the stream banner ffmpeg
+    prints while extracting, or None if it could not be read. See run_ffmpeg
+    for on_stream_info.
+    """
+    global hwaccel_failed
+    os.makedirs(output_folder, exist_ok=True)
+
+    # Try hardware decoding + scaling first, and fall back to the CPU if it fails
+    hwaccel = None if hwaccel_failed else get_hwaccel()
+    attempts = [hwaccel, None] if hwaccel else [None]
+
+    # A failed attempt may already have printed the banner, only report the stream info once
+    notified = False
+
+    def notify_once(fps, duration):
+        nonlocal notified
+        if not notified:
+            notified = True
+            on_stream_info(fps, duration)
+
+    # Set when the GPU attempt failed for a reason other than the timeout, which is
+    # the input's (too long) rather than the GPU's fault
+    gpu_error = False
+
+    for attempt in attempts:
+        if attempt is None and hwaccel:
+            # Don't mix frames left over from the failed GPU attempt into the CPU's
+            with os.scandir(output_folder) as entries:
+                for entry in entries:
+                    if entry.name.endswith('.jpg'):
+                        os.remove(entry.path)
+
+        cmd = build_extract_cmd(video_path, output_folder, frame_interval, threads, hwaccel=attempt, scale=scale)
+        try:
+            fps = run_ffmpeg(cmd, timeout=10, on_stream_info=notify_once if on_stream_info else None)
+        except (OSError, subprocess.SubprocessError) as e:
+            if attempt:
+                gpu_error = not isinstance(e, subprocess.TimeoutExpired)
+                print(f"[WARN] Hardware accelerated extraction ({attempt[0]}) failed for {video_path}, "
+                      f"retrying on the CPU")
+            continue
+
+        # The input decodes fine on the CPU, so it was the GPU that failed
+        if attempt is None and gpu_error:
+            hwaccel_failed = True
+            print(f"[WARN] Disabling hardware accelerated extraction ({hwaccel[0]}), "
+                  f"using the CPU from now on")
+        return fps
+
+    print(f"[WARN] Could not extract frames from {video_path}")
+    return None
+
+def run_ffmpeg(cmd, timeout=None, on_stream_info=None):
+    """
+    Runs an ffmpeg command, parsing its stderr while it runs instead of after it exits.
+    Once the input's duration and fps have been printed, on_stream_info(fps, duration)
+    is called (at most once) while ffmpeg keeps running.
+
+    Returns the input fps (None if it could not be parsed). Raises
+    subprocess.CalledProcessError if ffmpeg fails, or subprocess.TimeoutExpired if
+    it is killed after `timeout` seconds.
+    """
+    # Nothing is written to stdout; stderr is consumed line by line below, so neither pipe can fill up
+    # Metadata in the banner isn't necessarily UTF-8 (e.g. Latin-1 titles), so never fail on decoding
+    proc = subprocess.Popen(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True, errors='replace')
+    timed_out = threading.Event()
+
+    def kill_on_timeout():
+        timed_out.set()
+        proc.kill()
+
+    timer = threading.Timer(timeout, kill_on_timeout) if timeout else None
+    if timer:
+        timer.start()
+
+    fps = None
+    duration = None
+    notified = on_stream_info is None
     try:
-        subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=True, timeout=10)
-    except:
-        print(f"[WARN] Could not extract frames from {video_path}")
-        
+        for line in proc.stderr:
+            # The input stream is listed before the output stream, so the first match is the source fps
+            if fps is None:
+                match = FFMPEG_FPS_PATTERN.search(line)
+                if match:
+                    fps = float(match.group(1)) * (1000 if match.group(2) else 1)
+            if duration is None:
+                match = FFMPEG_DURATION_PATTERN.search(line)
+                if match:
+                    hours, minutes, seconds = match.groups()
+                    duration = int(hours) * 3600 + int(minutes) * 60 + float(seconds)
+            if not notified and fps and duration:
+                on_stream_info(fps, duration)
+                notified = True
+        returncode = proc.wait()
+    finally:
+        if timer:
+            timer.cancel()
+        # Don't leave ffmpeg running if parsing or on_stream_info raised
+        if proc.poll() is None:
+            proc.kill()
+            proc.wait()
+        proc.stderr.close()
+
+    if timed_out.is_set():
+        raise subprocess.TimeoutExpired(cmd, timeout)
+    if returncode != 0:
+        raise subprocess.CalledProcessError(returncode, cmd)
+    return fps
+
 def copy_framestep_frames(src_folder, dest_folder, frame_interval=1):
     """
     Copy every `frame_interval`‑th JPG from *src_folder* to *dest_folder*,
-    renumbering sequentially (000001.jpg …). Uses shutil.copy2 to keep meta.
+    renumbering sequentially (000001.jpg …). Frames are hard-linked when both
+    folders are on the same filesystem, so no image data is written twice;
+    otherwise falls back to shutil.copy2 to keep meta.
+    Returns (number of frames copied, number of frames in src_folder).
     """
     os.makedirs(dest_folder, exist_ok=True)
 
     frames = sorted(glob.glob(os.path.join(src_folder, '*.jpg')))
     picked = frames[::frame_interval] if frame_interval > 0 else frames
 
+    use_links = True
     for idx, src in enumerate(picked, start=1):
-        shutil.copy2(src, os.path.join(dest_folder, f'{idx:06d}.jpg'))
+        dest = os.path.join(dest_folder, f'{idx:06d}.jpg')
+        if use_links:
+            try:
+                os.link(src, dest)
+                continue
+            except OSError:
+                # e.g. cross-device or a filesystem without hard links
+                use_links = False
+        shutil.copy2(src, dest)
+
+    return len(picked), len(frames)
 
 
 def get_frame_count(folder_path):
     """
     Counts how many .jpg files are in the specified folder_path.
     """
-    return len(glob.glob(os.path.join(folder_path, '*.jpg')))
+    with os.scandir(folder_path) as entries:
+        return sum(1 for entry in entries if entry.name.endswith('.jpg'))
+
+def iter_image_entries(total_frames, chunk_size=IMAGES_PER_CHUNK):
+    """
+    Lazily yields the serialized content of the "images" list for frames 1..total_frames,
+    as lists of up to chunk_size buffers (one per entry, prefixed with its separator)
+    that can be passed to os.writev as is. Only one chunk is held in memory at a time.
+    """
+    for start in range(1, total_frames + 1, chunk_size):
+        stop = min(start + chunk_size, total_frames + 1)
+        chunk = [NEXT_IMAGE_ENTRY_TEMPLATE % (i, i) for i in range(max(start, 2), stop)]
+        if start == 1:
+            chunk.insert(0, FIRST_IMAGE_ENTRY_TEMPLATE % (1, 1))
+        yield chunk
+
+def write_buffers(fd, buffers):
+    """
+    Writes all buffers to the file descriptor with a single os.writev call (no joining
+    into one large bytes object first), finishing a partial write with os.write.
+    """
+    written = os.writev(fd, buffers)
+    if written < sum(len(buffer) for buffer in buffers):
+        remaining = memoryview(b''.join(buffers))[written:]
+        while remaining:
+            remaining = remaining[os.write(fd, remaining):]
 
 def create_labels_json(video_name, frame_rate, total_frames, output_file):
     """
@@ -102,32 +327,64 @@ def create_labels_json(video_name, frame_rate, total_frames, output_file):
         "clip_stop": str(duration_ms)
     }
 
-    images_list = []
-    for i in range(1, total_frames + 1):
-        file_name = f"{i:06d}.jpg"
-        image_id_str = f"{i:06d}"
-        images_list.append({
-            "is_labeled": False,
-            "image_id": image_id_str,
-            "file_name": file_name,
-            "height": 1080,
-            "width": 1920
-        })
-
     annotations_list = []
     categories_list = []
     # categories_list = default_values.categories
 
-    data = {
-        "info": info_block,
-        "images": images_list,
-        "annotations": annotations_list,
-        "categories": categories_list
-    }
+    # The images are generated lazily and written straight to the file chunk by chunk
+    # (one writev per chunk) instead of building the full list first; the result is the same JSON document as
+    # {"info": ..., "images": [...], "annotations": [...], "categories": [...]}.
+    fd = os.open(output_file, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o666)
+    try:
+        write_buffers(fd, [b'{\n"info": ', orjson.dumps(info_block, option=orjson.OPT_INDENT_2), b',\n"images": ['])
+        for chunk in iter_image_entries(total_frames):
+            write_buffers(fd, chunk)
+        write_buffers(fd, [
+            b'\n],\n"annotations": ', orjson.dumps(annotations_list),
+            b',\n"categories": ', orjson.dumps(categories_list, option=orjson.OPT_INDENT_2),
+            b'\n}\n'
+        ])
+    finally:
+        os.close(fd)
+
+def move_file(src_path, dest_folder):
+    """
+    Moves src_path into dest_folder. Within one filesystem this is a plain rename.
+    Across filesystems the data is copied with os.copy_file_range, which stays in the
+    kernel and lets the filesystem reflink or copy server-side (btrfs, XFS, NFS, ...),
+    before the source is removed; falls back to shutil.move if that isn't supported.
+    """
+    dest_path = os.path.join(dest_folder, os.path.basename(src_path))
+    if os.stat(src_path).st_dev == os.stat(dest_folder).st_dev:
+        os.replace(src_path, dest_path)
+        return dest_path
+
+    remaining = None
+    try:
+        with open(src_path, 'rb') as src, open(dest_path, 'wb') as dst:
+            remaining = os.fstat(src.fileno()).st_size
+            while remaining > 0:
+                copied = os.copy_file_range(src.fileno(), dst.fileno(), remaining)
+                if copied == 0:
+                    # Nothing copied before EOF, i.e. not supported between these filesystems
+                    break
+                remaining -= copied
+    except (AttributeError, OSError):
+        # No copy_file_range (non-Linux / old kernel) or unsupported between these filesystems
+        remaining = None
+
+    if remaining != 0:
+        # Drop the partial copy and let shutil.move copy the whole file, the source is kept until then
+        try:
+            os.remove(dest_path)
+        except FileNotFoundError:
+            pass
+        return shutil.move(src_path, dest_path)
+
+    shutil.copystat(src_path, dest_path)
+    os.remove(src_path)
+    return dest_path
 
-    with open(output_file, 'w', encoding='utf-8') as f:
-        json.dump(data, f, indent=4)
-        
 def update_configs(
     absolute_run_folder,
     object_detection_config
@@ -148,6 +405,148 @@ def update_configs(
                 with open(object_detection_config, 'w', encoding='utf-8') as f:
                     f.writelines(lines)
 
+def get_video_subfolder_name(file_name):
+    """
+    Returns the folder name used for a video's frames and labels (e.g., "My Clip.mp4" -> "my-clip").
+    """
+    return os.path.splitext(file_name)[0].lower().replace(" ", "-")
+
+def process_video(
+    file_name,
+    input_dir,
+    train_dir,
+    all_frames_root,
+    frame_interval=1,
+    processed_run_folder=None,
+    delete_processed_video=False,
+    verbose=False,
+    ffmpeg_threads=0,
+    video_info=None
+):
+    """
+    Formats a single video into <train_dir>/<video>/ (sparse img1 + Labels-GameState.json)
+    and <all_frames_root>/<video>/img1. Runs in a worker process; main() rejects inputs
+    that map to the same folder name, so workers never touch the same files.
+
+    video_info is this video's entry from the probe cache, if any. It replaces the
+    header probe, and lets Labels-GameState.json be written before ffmpeg even starts.
+
+    Returns the summary entry for data_info.json and the video info to cache.
+    """
+    # Create subfolder and img1 folder for frames
+    video_subfolder_name = get_video_subfolder_name(file_name)
+    video_dir = os.path.join(train_dir, video_subfolder_name)
+
+    all_frames_dir = os.path.join(
+        all_frames_root, video_subfolder_name, "img1" # mirror <train>/<video>/img1
+    )
+    os.makedirs(all_frames_dir, exist_ok=True)
+    img_dir = os.path.join(video_dir, "img1")
+
+    os.makedirs(video_dir, exist_ok=True)
+    os.makedirs(img_dir, exist_ok=True)
+
+    video_path = os.path.join(input_dir, file_name)
+    base_name  = os.path.splitext(file_name)[0]
+    base_name_sanitized = base_name.replace(' ', '-').lower()
+
+    json_path = os.path.join(video_dir, "Labels-GameState.json")
+
+    # Labels-GameState.json only depends on the fps and the frame count. It is written in
+    # the background from the expected frame count while the frames are still being
+    # extracted, and only rewritten afterwards if the extracted count turns out different.
+    expected_labels = None
+    labels_future = None
+
+    with ThreadPoolExecutor(max_workers=1) as labels_executor:
+        def write_expected_labels(stream_fps, expected_frames):
+            nonlocal expected_labels, labels_future
+            expected_labels = (stream_fps, expected_frames)
+            labels_future = labels_executor.submit(
+                create_labels_json,
+                video_name=base_name_sanitized,
+                frame_rate=stream_fps,
+                total_frames=expected_frames,
+                output_file=json_path
+            )
+
+        def write_labels_for_duration(stream_fps, duration):
+            write_expected_labels(
+                stream_fps, math.ceil(round(duration * stream_fps) / max(frame_interval, 1))
+            )
+
+        # 1) Read the stream header (unless cached), frames only need rescaling if they
+        # aren't 1920x1080 already
+        if video_info:
+            probed_fps, width, height = video_info["fps"], video_info["width"], video_info["height"]
+            # The exact frame count is known from the last run
+            write_expected_labels(probed_fps, math.ceil(video_info["frames"] / max(frame_interval, 1)))
+        else:
+            probed_fps, width, height, duration = get_video_info(video_path)
+            if probed_fps and duration:
+                write_labels_for_duration(probed_fps, duration)
+
+        # 2) Extract **all** frames first. ffmpeg's banner only reports the stream info
+        # that the header probe could not provide.
+        banner_fps = extract_frames(
+            video_path, all_frames_dir, frame_interval=1, threads=ffmpeg_threads,
+            on_stream_info=None if labels_future else write_labels_for_duration,
+            scale=(width, height) != (1920, 1080)
+        )
+
+        # The banner rounds the fps (29.97 for 30000/1001), so it is only a fallback
+        fps = probed_fps or banner_fps
+
+        # 3) Copy only every Nth frame into img1, the copy already knows how many frames there
+        # are. Both counts come from this run, so a stale cached count never outlives a rerun
+        total_frames, all_frames = copy_framestep_frames(all_frames_dir, img_dir, frame_interval)
+
+        if labels_future is not None:
+            labels_future.result()
+
+    # 4) Create Labels-GameState.json, unless the one written during extraction already matches
+    if expected_labels != (fps, total_frames):
+        create_labels_json(
+            video_name=base_name_sanitized,
+            frame_rate=fps,
+            total_frames=total_frames,
+            output_file=json_path
+        )
+
+    # 5) Move videos to 'processed' or delete them, if specified
+    if processed_run_folder:
+        move_file(video_path, processed_run_folder)
+    elif delete_processed_video:
+        os.remove(video_path)
+
+    if verbose:
+        # Print as one block so output from parallel workers does not interleave
+        lines = [
+            f"Processing video: {video_path}...",
+            f"  - Detected FPS: {fps}",
+            f"  - Frames extracted to: {img_dir}",
+            f"  - Total frames extracted: {total_frames}",
+            f"  - {json_path} created.",
+            f"  - All frames: {all_frames}",
+            f"  - Copied (step {frame_interval}): {total_frames}",
+        ]
+        if processed_run_folder:
+            lines.append(f"  - Moved video to: {processed_run_folder}\n")
+        elif delete_processed_video:
+            lines.append(f"  - Deleted processed video.\n")
+        print("\n".join(lines))
+
+    # Collect details for this video
+    details = {
+        "original_file_name": file_name,
+        "video_name": base_name_sanitized,
+        "fps": fps,
+        "frames_extracted": total_frames
+    }
+    # Nothing is cached for a video that could not be extracted
+    video_info = {"fps": fps, "width": width, "height": height, "frames": all_frames} if all_frames else None
+    return details, video_info
+
 def main():
     parser = argparse.ArgumentParser(description="Format videos into a structured directory with frames + JSON.")
     parser.add_argument('-i', '--input_dir', type=str, default='./inputs', help='Input directory containing videos')
@@ -159,6 +558,12 @@ def main():
                         help='Extract every nth frame (e.g., 10 to extract every tenth frame)')
     parser.add_argument('--move_processed_videos', type=bool, default=False)
     parser.add_argument('--delete_processed_videos', type=bool, default=False)
+    parser.add_argument('--num_workers', type=int, default=max(1, (os.cpu_count() or 1) // 2),
+                        help='Number of videos to process in parallel')
+    parser.add_argument('--ffmpeg_threads', type=int, default=0,
+                        help='Threads used by each ffmpeg process (0 splits the cores between the videos run in parallel)')
+    parser.add_argument('--probe_cache', type=str, default=os.path.join('.cache', 'probe.json'),
+                        help='File caching the fps/resolution/frame count of already processed videos ("" to disable)')
     args = parser.parse_args()
     
     input_dir = args.input_dir
@@ -168,6 +573,25 @@ def main():
     temp_file_dir = args.temp_file_dir
     frame_interval = args.frame_interval
     
+    # Videos are independent, so each one is formatted in its own worker process
+    with os.scandir(input_dir) as entries:
+        video_sizes = {
+            entry.name: entry.stat().st_size for entry in entries
+            if entry.name.lower().endswith(('.mp4', '.webm'))
+        }
+
+    # Each video gets its own output folder, two inputs (e.g., clip.mp4 and Clip.webm)
+    # mapping to the same one would overwrite each other's frames and labels
+    subfolder_names = {}
+    for file_name in sorted(video_sizes):
+        subfolder_names.setdefault(get_video_subfolder_name(file_name), []).append(file_name)
+    duplicates = [names for names in subfolder_names.values() if len(names) > 1]
+    if duplicates:
+        for names in duplicates:
+            print(f"[ERROR] {', '.join(names)} would all be written to "
+                  f"'{get_video_subfolder_name(names[0])}'. Rename all but one of them.")
+        raise SystemExit("Video names must be unique (ignoring extension, case and spaces)")
+
     # Record start time
     start_time = time.time()
     start_dt = datetime.datetime.now()
@@ -185,84 +609,59 @@ def main():
     os.makedirs(all_frames_root, exist_ok=True)
     
     # Create a processed folder for this run
+    processed_run_folder = None
     if args.move_processed_videos:
         processed_run_folder = os.path.join("processed", f"run_{timestamp}")
         os.makedirs(processed_run_folder, exist_ok=True)
 
-    # For collecting summary info about the run
-    video_details = []
-    video_counter = 1
-
-    # Loop through all mp4/webm files in input_dir
-    for file_name in sorted(os.listdir(input_dir)):
-        if file_name.lower().endswith(('.mp4', '.webm')):
-            # Create subfolder and img1 folder for frames
-            video_subfolder_name = os.path.splitext(file_name)[0].lower().replace(" ", "-")
-            video_dir = os.path.join(train_dir, video_subfolder_name)
-            
-            all_frames_dir = os.path.join(
-                all_frames_root, video_subfolder_name, "img1" # mirror <train>/<video>/img1
-            )
-            os.makedirs(all_frames_dir, exist_ok=True)   
-            img_dir = os.path.join(video_dir, "img1")
-
-            os.makedirs(video_dir, exist_ok=True)
-            os.makedirs(img_dir, exist_ok=True)
-            
-            video_path = os.path.join(input_dir, file_name)
-            base_name  = os.path.splitext(file_name)[0]
-            base_name_sanitized = base_name.replace(' ', '-').lower()
-
-            # 1) FPS
-            fps = get_video_fps(video_path)
-
-            # 2) Extract **all** frames first
-            extract_frames(video_path, all_frames_dir, frame_interval=1)
-
-            # 3) Copy only every Nth frame into img1
-            copy_framestep_frames(all_frames_dir, img_dir, frame_interval)
+    # Fewer videos than workers leave cores idle, so the threads are split between the
+    # videos actually running at once rather than between all workers
+    ffmpeg_threads = args.ffmpeg_threads or max(
+        1, (os.cpu_count() or 1) // max(1, min(args.num_workers, len(video_sizes)))
+    )
 
-            # 4) Count frames that actually landed in img1
-            total_frames = get_frame_count(img_dir)
-
-            # 4) Create Labels-GameState.json
-            json_path = os.path.join(video_dir, "Labels-GameState.json")
-            create_labels_json(
-                video_name=base_name_sanitized,
-                frame_rate=fps,
-                total_frames=total_frames,
-                output_file=json_path
+    # Keys are computed up front, the videos may be moved or deleted by the workers
+    probe_cache = load_probe_cache(args.probe_cache) if args.probe_cache else {}
+    cache_keys = {
+        file_name: probe_cache_key(os.path.join(input_dir, file_name)) for file_name in video_sizes
+    }
+    with ProcessPoolExecutor(max_workers=args.num_workers) as executor:
+        # Largest videos are submitted first, so a long video doesn't end up running alone at the end
+        futures = {
+            file_name: executor.submit(
+                process_video,
+                file_name,
+                input_dir,
+                train_dir,
+                all_frames_root,
+                frame_interval,
+                processed_run_folder,
+                args.delete_processed_videos,
+                verbose,
+                ffmpeg_threads,
+                probe_cache.get(cache_keys[file_name])
             )
-                
-            # 5) Move videos to 'processed' or delete them, if specified
-            if args.move_processed_videos:
-                shutil.move(video_path, processed_run_folder)
-            elif args.delete_processed_videos:
-                os.remove(video_path)              
-
-            # Collect details for this video
-            video_details.append({
-                "original_file_name": file_name,
-                "video_name": base_name_sanitized,
-                "fps": fps,
-                "frames_extracted": total_frames
-            })
-
-            if verbose:
-                print(f"Processing video: {video_path}...")
-                print(f"  - Detected FPS: {fps}")
-                print(f"  - Frames extracted to: {img_dir}")
-                print(f"  - Total frames extracted: {total_frames}")
-                print(f"  - {json_path} created.")
-                print(f"  - All frames: {get_frame_count(all_frames_dir)}")
-                print(f"  - Copied (step {frame_interval}): {total_frames}")
-                
-                if args.move_processed_videos:
-                    print(f"  - Moved video to: {processed_run_folder}\n")
-                elif args.delete_processed_videos:
-                    print(f"  - Deleted processed video.\n")
-                    
-            video_counter += 1
+            for file_name in sorted(video_sizes, key=video_sizes.get, reverse=True)
+        }
+        # For collecting summary info about the run (in file name order)
+        video_details = []
+        for file_name in sorted(futures):
+            try:
+                details, video_info = futures[file_name].result()
+            except Exception as e:
+                # e.g. an undecodable file. process_video only moves/deletes the input once it
+                # is done, so it is kept; drop its partial output so the dataset stays consistent
+                print(f"[WARN] Could not process {file_name}, skipping it: {e!r}")
+                subfolder_name = get_video_subfolder_name(file_name)
+                shutil.rmtree(os.path.join(train_dir, subfolder_name), ignore_errors=True)
+                shutil.rmtree(os.path.join(all_frames_root, subfolder_name), ignore_errors=True)
+                continue
+            video_details.append(details)
+            if video_info:
+                probe_cache[cache_keys[file_name]] = video_info
+
+    if args.probe_cache:
+        save_probe_cache(probe_cache, args.probe_cache)
 
     # Record end time and compute duration
     end_time = time.time()
@@ -7,11 +7,21 @@ runs a YOLO model for player detection, and deletes videos that do not meet the
 """
 
 import argparse
+import functools
 import os
 import sys
-import cv2
+import av
 import subprocess
+import torch
+import torch.nn.functional as F
 from ultralytics import YOLO
+from video_utils import get_video_info
+
+try:
+    # Optional (requires torch>=2): decodes straight to CUDA tensors using NVDEC
+    from torchcodec.decoders import VideoDecoder
+except ImportError:
+    VideoDecoder = None
 
 # Configuration constants
 CONF_THRESHOLD = 0.5        # Minimum confidence for a detection
@@ -21,63 +31,130 @@ MAX_BBOX_HEIGHT_RATIO = 1/4 # Maximum allowed fraction of the frame height for a
 CHUNK_LENGTH = 12  # max length of each video chunk (in seconds)
 OVERLAP = 2        # overlap between consecutive chunks (in seconds)
 
-def get_middle_frame(video_path):
-    """Extract the middle frame of the given video."""
-    cap = cv2.VideoCapture(video_path)
-    if not cap.isOpened():
+BATCH_SIZE = 16    # number of middle frames passed to the YOLO model per call
+YOLO_IMGSZ = 640   # size frames decoded on the GPU are letterboxed to before detection
+
+def letterbox_tensor(frame, size=YOLO_IMGSZ):
+    """
+    Resize a CHW uint8 frame tensor (keeping the aspect ratio) and pad it to a
+    size x size float RGB tensor in [0, 1], as the YOLO model expects tensor input.
+    Returns the padded tensor and the height of the resized frame inside it.
+    """
+    _, height, width = frame.shape
+    scale = size / max(height, width)
+    new_height, new_width = round(height * scale), round(width * scale)
+    resized = F.interpolate(
+        frame.unsqueeze(0).float() / 255, size=(new_height, new_width), mode='bilinear', align_corners=False
+    )[0]
+    top = (size - new_height) // 2
+    left = (size - new_width) // 2
+    padded = F.pad(resized, (left, size - new_width - left, top, size - new_height - top), value=114 / 255)
+    return padded, new_height
+
+def get_middle_frame_cuda(video_path):
+    """
+    Decode the middle frame of the given video directly into GPU memory with torchcodec
+    (NVDEC), so it never passes through host memory on its way to the model.
+    The frame is letterboxed to YOLO_IMGSZ; the returned height is that of the resized
+    frame, which keeps the bounding box height ratio check unchanged.
+    """
+    try:
+        decoder = VideoDecoder(video_path, device='cuda', seek_mode='approximate')
+        frame = decoder.get_frame_at(len(decoder) // 2).data
+    except (RuntimeError, ValueError, IndexError):
         return None, None
-    total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
-    mid_frame_index = total_frames // 2
-    cap.set(cv2.CAP_PROP_POS_FRAMES, mid_frame_index)
-    ret, frame = cap.read()
-    cap.release()
-    if not ret:
+    return letterbox_tensor(frame)
+
+def get_middle_frame(video_path):
+    """
+    Extract the middle frame of the given video. Decodes on the GPU with torchcodec
+    when it is installed and CUDA is available, otherwise (or if that fails) with PyAV.
+
+    PyAV seeks to the keyframe at (or just before) the middle and decodes only that
+    frame, instead of decoding or counting frames from the start of the video.
+    """
+    if VideoDecoder is not None and torch.cuda.is_available():
+        frame, frame_height = get_middle_frame_cuda(video_path)
+        if frame is not None:
+            return frame, frame_height
+
+    try:
+        with av.open(video_path) as container:
+            stream = container.streams.video[0]
+            if stream.duration:
+                # Stream duration and start time are in stream.time_base units
+                container.seek((stream.start_time or 0) + stream.duration // 2, stream=stream)
+            elif container.duration:
+                # Container duration is in av.time_base (microsecond) units
+                container.seek(container.duration // 2)
+            frame = next(container.decode(stream), None)
+            if frame is None:
+                return None, None
+            image = frame.to_ndarray(format='bgr24')
+    except (av.error.FFmpegError, IndexError):
         return None, None
-    return frame, frame.shape[0]  # Return frame and its height
-
-def run_detection(model, frame):
-    """Run the YOLO model on the frame and return list of detections."""
-    results = model(frame)
-    detections = []
-    for result in results:
-        boxes = result.boxes
-        for i in range(len(boxes)):
-            conf = float(boxes.conf[i])
-            if conf < CONF_THRESHOLD:
+    return image, image.shape[0]  # Return frame and its height
+
+@functools.lru_cache(maxsize=4)
+def load_model(weights):
+    """
+    Load (and fuse conv+bn of) the YOLO model once per weights file, so repeated
+    calls to main() from the same process reuse the already loaded model.
+    """
+    model = YOLO(weights)
+    model.fuse()
+    return model
+
+def run_detection(model, frames):
+    """
+    Run the YOLO model on a batch of frames in a single call and return the
+    detected boxes (conf and xyxy tensors) of each frame. Uses FP16 inference on CUDA.
+
+    Frames can be BGR numpy arrays (PyAV) or letterboxed GPU tensors (torchcodec);
+    the tensors are stacked into one batch tensor, arrays are passed as a list.
+    """
+    tensor_indices = [i for i, frame in enumerate(frames) if isinstance(frame, torch.Tensor)]
+    array_indices = [i for i, frame in enumerate(frames) if not isinstance(frame, torch.Tensor)]
+
+    batch_boxes = [None] * len(frames)
+    with torch.inference_mode():
+        for indices, stack in ((tensor_indices, True), (array_indices, False)):
+            if not indices:
                 continue
-            x1, y1, x2, y2 = boxes.xyxy[i].tolist()
-            detections.append({'bbox': (x1, y1, x2, y2), 'conf': conf})
-    return detections
+            inputs = [frames[i] for i in indices]
+            if stack:
+                inputs = torch.stack(inputs)
+            results = model(inputs, verbose=False, half=torch.cuda.is_available())
+            for i, result in zip(indices, results):
+                batch_boxes[i] = result.boxes
+    return batch_boxes
 
-def check_criteria(detections, frame_height):
+def check_criteria(boxes, frame_height):
     """
     Return True if the frame meets the criteria:
-    - At least MIN_PLAYERS detected.
+    - At least MIN_PLAYERS detected (above CONF_THRESHOLD).
     - No bounding box height exceeds MAX_BBOX_HEIGHT_RATIO of the frame height.
+    The boxes are checked as tensors, without a Python loop over the detections.
     """
-    if len(detections) < MIN_PLAYERS:
-        print(f"[INFO] Not enough players detected ({len(detections)} of minimum {MIN_PLAYERS}).")
+    confident = boxes.conf >= CONF_THRESHOLD
+    num_players = int(confident.sum())
+    if num_players < MIN_PLAYERS:
+        print(f"[INFO] Not enough players detected ({num_players} of minimum {MIN_PLAYERS}).")
+        return False
+    max_height = frame_height * MAX_BBOX_HEIGHT_RATIO
+    xyxy = boxes.xyxy[confident]
+    heights = xyxy[:, 3] - xyxy[:, 1]
+    if (heights >= max_height).any():
+        print(f"[INFO] Bounding box too large: {float(heights.max())} >= {max_height} (frame height is {frame_height}). Video will be deleted.")
         return False
-    for det in detections:
-        x1, y1, x2, y2 = det['bbox']
-        if (y2 - y1) >= frame_height * MAX_BBOX_HEIGHT_RATIO:
-            print(f"[INFO] Bounding box too large: {y2 - y1} >= {frame_height * MAX_BBOX_HEIGHT_RATIO} (frame height is {frame_height}). Video will be deleted.")
-            return False
     return True
 
 def get_video_duration(video_path):
     """
-    Use ffprobe to retrieve the duration (in seconds) of the video.
+    Retrieve the duration (in seconds) of the video from its container header.
     """
     try:
-        cmd = [
-            'ffprobe', '-v', 'error',
-            '-show_entries', 'format=duration',
-            '-of', 'csv=p=0', video_path
-        ]
-        result = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, check=True)
-        duration = float(result.stdout.strip())
-        return duration
+        return get_video_info(video_path)[3]
     except Exception as e:
         print(f"[WARN] Could not determine duration for {video_path}: {e}")
         return 0.0
@@ -143,19 +220,13 @@ def split_video_into_segments(video_path, chunk_length=30, overlap=1):
         if (total_duration - start) < 0.5:
             break
 
-def process_video(model, video_path):
+def process_video(video_path, boxes, frame_height):
     """
-    Process a single video file: extract its middle frame,
-    run detection, and delete the video if the criteria are not met.
+    Process a single video file given the boxes detected on its middle frame:
+    delete the video if the criteria are not met.
     If kept, split the video into 30s chunks with 1s overlap in the same directory.
     """
-    frame, frame_height = get_middle_frame(video_path)
-    if frame is None:
-        print(f"[WARN] Unable to read frame from: {video_path}")
-        return False
-
-    detections = run_detection(model, frame)
-    if not check_criteria(detections, frame_height):
+    if not check_criteria(boxes, frame_height):
         os.remove(video_path)
         print(f"[INFO] Deleted: {video_path}")
         return False
@@ -169,25 +240,52 @@ def process_video(model, video_path):
     )
     return True
 
+def process_batch(model, batch):
+    """
+    Run detection on the middle frames of a batch of (video_path, frame, frame_height)
+    entries at once, then keep or delete each video. Returns the number of deleted videos.
+    """
+    batch_boxes = run_detection(model, [frame for _, frame, _ in batch])
+    num_deleted = 0
+    for (video_path, _, frame_height), boxes in zip(batch, batch_boxes):
+        if not process_video(video_path, boxes, frame_height):
+            num_deleted += 1
+    return num_deleted
+
 def main(folder_path, model):
-    """Iterate over video files in the folder and process each one."""
+    """Iterate over video files in the folder and process them in batches."""
     if not os.path.isdir(folder_path):
         print(f"[ERROR] {folder_path} is not a valid directory.")
         return
-    model = YOLO(model)
+    model = load_model(model)
     
     num_processed = 0
     num_deleted = 0
-    for filename in os.listdir(folder_path):
-        if not filename.lower().endswith(('.mp4', '.avi', '.mov', '.mkv', '.webm')):
-            continue
+    batch = []
+    # Listed up front, since kept videos are split into new chunk files in the same folder
+    with os.scandir(folder_path) as entries:
+        video_paths = [
+            entry.path for entry in entries
+            if entry.name.lower().endswith(('.mp4', '.avi', '.mov', '.mkv', '.webm'))
+        ]
 
-        video_path = os.path.join(folder_path, filename)
+    for video_path in video_paths:
         num_processed += 1
-        
-        was_kept = process_video(model, video_path)
-        if not was_kept:
+
+        frame, frame_height = get_middle_frame(video_path)
+        if frame is None:
+            print(f"[WARN] Unable to read frame from: {video_path}")
             num_deleted += 1
+            continue
+
+        # Only BATCH_SIZE middle frames are held in memory at a time
+        batch.append((video_path, frame, frame_height))
+        if len(batch) == BATCH_SIZE:
+            num_deleted += process_batch(model, batch)
+            batch = []
+
+    if batch:
+        num_deleted += process_batch(model, batch)
 
     print(f"[INFO] Processed {num_processed} videos, deleted {num_deleted}.")
 
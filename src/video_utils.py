@@ -0,0 +1,68 @@
+"""
+Video helpers shared by the pipeline scripts (format_to_soccernet.py and
+remove_unwanted_scenes.py).
+"""
+
+import json
+import os
+import av
+
+
+def get_video_info(video_path):
+    """
+    Returns (fps, width, height, duration in seconds) of the first video stream,
+    read in-process from the container header with PyAV (e.g., (25.0, 1920, 1080, 12.0)).
+    """
+    with av.open(video_path) as container:
+        stream = container.streams.video[0]
+        # average_rate is missing (or 0/1) for some webm/VFR files, fall back
+        # to the stream's base rate like ffprobe's r_frame_rate.
+        rate = stream.average_rate or stream.base_rate or stream.guessed_rate
+        width = stream.codec_context.width
+        height = stream.codec_context.height
+        # Same as ffprobe's format=duration; container.duration is in av.time_base units
+        if container.duration:
+            duration = container.duration / av.time_base
+        elif stream.duration and stream.time_base:
+            duration = float(stream.duration * stream.time_base)
+        else:
+            duration = 0.0
+
+    return (float(rate) if rate else 0.0), width, height, duration
+
+
+def probe_cache_key(video_path):
+    """
+    Key identifying the contents of video_path by its absolute path, size and
+    modification time, so an edited or replaced file never hits a stale entry.
+    """
+    st = os.stat(video_path)
+    return f"{os.path.abspath(video_path)}:{st.st_size}:{int(st.st_mtime)}"
+
+
+def load_probe_cache(cache_path):
+    """
+    Returns the probe cache stored at cache_path, mapping probe_cache_key() to the
+    recorded video info ({} if the file is missing or unreadable). Entries for videos
+    that no longer exist (e.g. deleted after processing) are dropped, so the cache
+    doesn't keep growing across runs.
+    """
+    try:
+        with open(cache_path, 'r', encoding='utf-8') as f:
+            cache = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    # Keys are "<path>:<size>:<mtime>", the path itself may contain ':'
+    return {key: info for key, info in cache.items() if os.path.exists(key.rsplit(':', 2)[0])}
+
+
+def save_probe_cache(cache, cache_path):
+    """
+    Writes the probe cache to cache_path. Written to a temporary file first and then
+    renamed, so a concurrent run never reads a half written cache.
+    """
+    os.makedirs(os.path.dirname(cache_path) or '.', exist_ok=True)
+    tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(cache, f, indent=4)
+    os.replace(tmp_path, cache_path)